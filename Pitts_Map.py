@@ -1,22 +1,222 @@
 import streamlit as st
-from streamlit_folium import st_folium
 import folium
+import pydeck as pdk
 import osmnx as ox
 import networkx as nx
-from shapely.geometry import Point
-from shapely import wkt  # For converting WKT strings to geometry objects
+import shapely  # Vectorized WKT/WKB parsing (Shapely 2.x)
 import pandas as pd
 import numpy as np
 import requests
+import io
+import os
+import hashlib
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing import NamedTuple
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+from scipy.spatial import cKDTree
+
+try:
+    from numba import njit
+except ImportError:  # numba is optional; routing falls back to scipy's csgraph
+    njit = None
+
+# Fail fast on a slow Nominatim instead of osmnx's 180 s default
+ox.settings.requests_timeout = 10
+
+# Timeout in seconds for fetches from raw.githubusercontent.com
+HTTP_TIMEOUT = 10
+
+# Edge indexes built from downloaded slope files are saved here, so a restarted
+# app process only revalidates the download instead of re-parsing it
+SLOPE_CACHE_DIR = os.path.join(tempfile.gettempdir(), "pitts_slope_cache")
+
+# Downloaded preloaded maps are saved here with their ETag, so an expired
+# get_preloaded_map_html entry only costs a 304. At most MAP_CACHE_MAX_FILES
+# maps are kept, matching get_preloaded_map_html's max_entries
+MAP_CACHE_DIR = os.path.join(tempfile.gettempdir(), "pitts_map_cache")
+MAP_CACHE_MAX_FILES = 32
+
+# Routes are first searched within this multiple of the straight-line distance
+# between the endpoints, and only re-run unbounded if that finds nothing
+ROUTE_LIMIT_FACTOR = 2.5
+
+# Node coordinates are snapped to this many units per degree before nodes are
+# matched up. 1e7 is OpenStreetMap's own coordinate precision (~1 cm), so float
+# noise in the CSVs merges while distinct OSM nodes never do
+NODE_COORD_SCALE = 1e7
+
+# Route map renderer: "pydeck" (WebGL PathLayer) or "folium" (Leaflet HTML)
+MAP_RENDERER = "pydeck"
+
+# Extension of the slope files to load: "csv", or "parquet" / "npz" once the
+# output of Pitts_Slope_Parquet.py / Pitts_Preload_Graph.py is published next
+# to the CSVs. Each loads the full dataset once per network and filters it per
+# threshold in memory
+SLOPE_FILE_FORMAT = "csv"
+
+# Full-network slope CSVs the app filters per threshold, which
+# Pitts_Slope_Parquet.py and Pitts_Preload_Graph.py convert
+FULL_SLOPE_FILES = ["pittsburgh_street_slopes.csv", "pittsburgh_bike_slopes.csv"]
+
+# ------------------------------
+# HTTP Session (shared)
+# ------------------------------
+@st.cache_resource(show_spinner=False)
+def get_http_session():
+    """
+    Returns one requests.Session shared by every rerun and user session, so
+    fetches from raw.githubusercontent.com reuse pooled keep-alive connections
+    instead of paying a new TCP + TLS handshake each time. Connection errors
+    and transient 5xx responses are retried twice with a short backoff.
+    """
+    retries = Retry(
+        total=2, backoff_factor=0.3, status_forcelist=(502, 503, 504), raise_on_status=False
+    )
+    session = requests.Session()
+    session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=retries))
+    return session
+
+def read_binary(path):
+    """
+    Returns the raw bytes of a data file, fetched through the shared session
+    for URLs (which requests gzip and decompresses transparently) and read
+    from disk otherwise.
+    """
+    if path.startswith(("http://", "https://")):
+        response = get_http_session().get(path, timeout=HTTP_TIMEOUT)
+        response.raise_for_status()
+        return response.content
+    with open(path, "rb") as f:
+        return f.read()
+
+@st.cache_resource(show_spinner=False)
+def get_prefetch_pool():
+    """
+    Returns the shared thread pool that downloads preloaded maps in the
+    background (see prefetch_preloaded_maps).
+    """
+    return ThreadPoolExecutor(max_workers=4)
+
+@st.cache_resource(show_spinner=False)
+def get_prefetch_store():
+    """
+    Returns the shared {url: future} store of background preloaded-map
+    downloads still in flight.
+    """
+    return {}
+
+# ------------------------------
+# Fetch Preloaded Map HTML (cached)
+# ------------------------------
+def read_cached_map(cache_base):
+    """
+    Returns the (etag, html) pair saved under cache_base by save_cached_map, or
+    None if there is none or it was pruned while being read.
+    """
+    try:
+        with open(cache_base + ".etag") as f:
+            etag = f.read()
+        with open(cache_base + ".html", encoding="utf-8") as f:
+            return etag, f.read()
+    except OSError:
+        return None
+
+def save_cached_map(cache_base, etag, html):
+    """
+    Saves a downloaded map and its ETag under cache_base, then deletes the
+    oldest saved maps beyond MAP_CACHE_MAX_FILES. Failures are ignored, since
+    the disk copy is only an optimization.
+    """
+    # Write to temporary names and rename, so a concurrent or interrupted
+    # write never leaves a half-written copy behind
+    try:
+        os.makedirs(MAP_CACHE_DIR, exist_ok=True)
+        with open(cache_base + ".tmp.html", "w", encoding="utf-8") as f:
+            f.write(html)
+        os.replace(cache_base + ".tmp.html", cache_base + ".html")
+        with open(cache_base + ".tmp.etag", "w") as f:
+            f.write(etag)
+        os.replace(cache_base + ".tmp.etag", cache_base + ".etag")
+
+        saved = [entry for entry in os.scandir(MAP_CACHE_DIR) if entry.name.endswith(".etag")]
+        saved.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+        for entry in saved[MAP_CACHE_MAX_FILES:]:
+            old_base = entry.path[:-len(".etag")]
+            os.remove(old_base + ".etag")
+            os.remove(old_base + ".html")
+    except OSError:
+        pass
+
+def fetch_preloaded_map_html(map_url, session):
+    """
+    Downloads a preloaded map's HTML with session, or returns None if it does
+    not exist (404). Any other failure raises, so that st.cache_data does not
+    keep it and the next request tries again. A copy saved in MAP_CACHE_DIR is
+    revalidated with its ETag, so an unchanged map costs a 304 instead of a
+    full download. The body is decoded once and held in memory only by the
+    caller's cache.
+    """
+    cache_base = os.path.join(MAP_CACHE_DIR, hashlib.sha1(map_url.encode()).hexdigest())
+    saved = read_cached_map(cache_base)
+    headers = {'If-None-Match': saved[0]} if saved is not None else {}
+
+    response = session.get(map_url, headers=headers, timeout=HTTP_TIMEOUT)
+    if response.status_code == 304 and saved is not None:
+        try:
+            os.utime(cache_base + ".etag")  # Keep recently used maps from being pruned
+        except OSError:
+            pass
+        return saved[1]
+    if response.status_code == 404:
+        return None
+    response.raise_for_status()
+
+    html = response.text
+    if 'ETag' in response.headers:
+        save_cached_map(cache_base, response.headers['ETag'], html)
+    return html
+
+@st.cache_data(ttl=3600, max_entries=32, show_spinner=False)
+def get_preloaded_map_html(map_url):
+    """
+    Returns a preloaded map's HTML, or None if it does not exist. Bodies are
+    cached for an hour; failed downloads raise and are not cached.
+    """
+    return fetch_preloaded_map_html(map_url, get_http_session())
+
+def prefetch_preloaded_maps(map_urls):
+    """
+    Warms the get_preloaded_map_html cache for map_urls in the background, so
+    the next request for them is served without waiting on the network. Each
+    worker calls get_preloaded_map_html itself: URLs already cached cost
+    nothing, and a request made while a download is in flight waits on the
+    cache's per-key lock instead of downloading again. URLs with a prefetch
+    still in flight are skipped.
+    """
+    store = get_prefetch_store()
+    pool = get_prefetch_pool()
+    for map_url in map_urls:
+        if map_url in store:
+            continue
+        future = pool.submit(get_preloaded_map_html, map_url)
+        store[map_url] = future
+        future.add_done_callback(lambda _, map_url=map_url: store.pop(map_url, None))
 
 # ------------------------------
 # Display Preloaded Map
 # ------------------------------
-def display_preloaded_map(threshold, map_folder, network_label="Network"):
+def display_preloaded_map(threshold, map_folder, network_label="Network", max_threshold=None):
     """
     Displays a preloaded Folium map for a given slope threshold.
     Uses different file-name prefixes depending on whether
     it's the Bike Network or Vehicle Drive Network.
+    The maps for the neighbouring thresholds (within 1..max_threshold) are
+    then prefetched, since the threshold is usually stepped by one.
     """
     # Decide prefix for the HTML file based on the network type
     if "Bike" in network_label:
@@ -25,12 +225,17 @@ def display_preloaded_map(threshold, map_folder, network_label="Network"):
         prefix = "slope_map_threshold_"
 
     # Construct the expected URL
-    map_url = f"{map_folder}/{prefix}{int(threshold)}.html"
+    threshold = int(threshold)
+    map_url = f"{map_folder}/{prefix}{threshold}.html"
+
+    try:
+        html = get_preloaded_map_html(map_url)
+    except requests.RequestException as e:
+        st.error(f"Could not download the preloaded map for slope threshold {threshold}%: {e}")
+        return
 
-    response = requests.get(map_url)
-    if response.status_code == 200:
+    if html is not None:
         st.subheader(f"{network_label} Map for Absolute Slope ≤ {threshold}%")
-        html = response.text
         st.components.v1.html(html, height=500, scrolling=True)
     else:
         st.warning(
@@ -38,6 +243,657 @@ def display_preloaded_map(threshold, map_folder, network_label="Network"):
             f"Expected URL: {map_url}"
         )
 
+    neighbours = [t for t in (threshold - 1, threshold + 1) if t >= 1]
+    if max_threshold is not None:
+        neighbours = [t for t in neighbours if t <= max_threshold]
+    prefetch_preloaded_maps([f"{map_folder}/{prefix}{t}.html" for t in neighbours])
+
+# ------------------------------
+# Geocoding (cached)
+# ------------------------------
+@st.cache_resource(show_spinner=False)
+def get_nominatim_lock():
+    """
+    Returns the lock held around every Nominatim request, so the app as a whole
+    sends them one at a time to respect Nominatim's limit of one request per
+    second (ox.geocode pauses before each request).
+    """
+    return threading.Lock()
+
+@st.cache_data(ttl=86400, show_spinner=False)
+def geocode_cached(address):
+    """
+    Geocodes an address to a (lat, lon) tuple with ox.geocode. Results are kept
+    for a day, so re-running a route at another threshold does not repeat the
+    Nominatim round-trip. Only cache misses take the Nominatim lock, so cached
+    addresses never wait behind other sessions' lookups.
+    """
+    with get_nominatim_lock():
+        return ox.geocode(address)
+
+def normalize_address(address):
+    """
+    Returns the geocoding key for a user-entered address: whitespace collapsed,
+    lowercased (Nominatim ignores case) and with ", pittsburgh, pa" appended
+    if Pittsburgh is not mentioned, so trivially different spellings of the
+    same address share one geocode_cached entry.
+    """
+    address = " ".join(address.split()).lower()
+    # Improve geocoding by appending Pittsburgh if missing
+    if "pittsburgh" not in address:
+        address = f"{address}, pittsburgh, pa"
+    return address
+
+# ------------------------------
+# Cached Edge Index
+# ------------------------------
+class SlopeEdges(NamedTuple):
+    """
+    The unfiltered edge list of one slope file, built once and shared by every
+    threshold graph derived from it. Edges are sorted by abs_slope_percentage,
+    so the streets within any threshold are a prefix of the arrays found with
+    one searchsorted. node_xy holds every node of the file, so node ids are the
+    same in all threshold graphs. geometries holds each edge's geometry as it
+    was read (WKT text, WKB bytes or a shapely geometry); parse_geometries
+    decodes only the ones a route needs.
+    """
+    node_xy: np.ndarray
+    u_ids: np.ndarray
+    v_ids: np.ndarray
+    lengths: np.ndarray
+    slopes: np.ndarray
+    geometries: np.ndarray
+
+# ------------------------------
+# Cached Threshold Graph
+# ------------------------------
+class SlopeGraph(NamedTuple):
+    """
+    Everything built once per threshold graph and reused across queries.
+    Parallel edges are collapsed to the shortest one, so csr holds exactly one
+    edge per (u, v) pair. Routing runs on csr alone; edge_pos, parallel to
+    csr.data, holds each edge's int32 position in geometries, the SlopeEdges
+    array shared by every threshold, and is only read for the edges of the
+    final path. node_ids lists the nodes with at least one edge under the
+    threshold, in tree order.
+    """
+    node_xy: np.ndarray
+    node_ids: np.ndarray
+    tree: cKDTree
+    csr: csr_matrix
+    edge_pos: np.ndarray
+    geometries: np.ndarray
+
+# ------------------------------
+# Nearest-Node Lookup
+# ------------------------------
+def lonlat_to_unit_xyz(lonlat):
+    """
+    Converts an [N, 2] array of (lon, lat) degrees to points on the unit sphere.
+    Straight-line (chord) distance between these points is monotonic in the
+    great-circle distance, so a KD-tree over them gives haversine-correct
+    nearest neighbours.
+    """
+    lon = np.deg2rad(lonlat[:, 0])
+    lat = np.deg2rad(lonlat[:, 1])
+    cos_lat = np.cos(lat)
+    return np.column_stack([cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)])
+
+def find_nearest_nodes(graph, target_points):
+    """
+    Returns the ids of the graph nodes closest to each of target_points, given
+    as (lat, lon) pairs like the output of ox.geocode, in one batched KD-tree
+    query against the cached SlopeGraph index.
+    """
+    lat_lon = np.asarray(target_points, dtype=np.float64).reshape(-1, 2)
+    _, idx = graph.tree.query(lonlat_to_unit_xyz(lat_lon[:, ::-1]), k=1)
+    return graph.node_ids[idx]
+
+# ------------------------------
+# Load Slope Data
+# ------------------------------
+# Columns build_edge_index reads; slope files are read with only these
+SLOPE_COLUMNS = [
+    'start_lat', 'start_lon', 'end_lat', 'end_lon',
+    'length', 'abs_slope_percentage', 'geometry'
+]
+
+def parse_geometries(values):
+    """
+    Converts a sequence of edge geometries as read from a slope file (WKT
+    strings, WKB bytes or already-parsed shapely geometries) into an object
+    array of shapely geometries, with one vectorized shapely.from_wkt /
+    from_wkb call per encoding. Missing values (NaN/None), which both parsers
+    reject, become None.
+    """
+    values = np.asarray(values, dtype=object)
+    is_wkt = np.fromiter((isinstance(v, str) for v in values), dtype=bool, count=len(values))
+    is_wkb = np.fromiter((isinstance(v, bytes) for v in values), dtype=bool, count=len(values))
+    is_geometry = shapely.is_geometry(values)
+
+    geoms = np.full(len(values), None, dtype=object)
+    geoms[is_wkt] = shapely.from_wkt(values[is_wkt])
+    geoms[is_wkb] = shapely.from_wkb(values[is_wkb])
+    geoms[is_geometry] = values[is_geometry]
+    return geoms
+
+def load_slope_data(slope_file, content=None):
+    """
+    Reads a slope file into a DataFrame. Parquet files (see
+    Pitts_Slope_Parquet.py) store geometry as WKB; anything else is read as CSV
+    with WKT geometry. The geometry column is left encoded, since a route only
+    draws a few of its edges (see parse_geometries), and only SLOPE_COLUMNS are
+    read in either case. CSV headers may carry stray whitespace, which is
+    stripped; Parquet files are written with stripped names. URLs are
+    downloaded through the shared HTTP session unless content, the already
+    downloaded bytes of slope_file, is given.
+    """
+    source = io.BytesIO(content if content is not None else read_binary(slope_file))
+    if slope_file.endswith(".parquet"):
+        return pd.read_parquet(source, engine='pyarrow', columns=SLOPE_COLUMNS)
+
+    # The pyarrow engine only selects columns by exact name, so read the
+    # header on its own and select the raw names whose stripped form is needed
+    header = pd.read_csv(source, nrows=0).columns
+    source.seek(0)
+    slope_data = pd.read_csv(
+        source, skip_blank_lines=True, header=0, engine='pyarrow',
+        usecols=[col for col in header if col.strip() in SLOPE_COLUMNS]
+    )
+    slope_data.columns = [col.strip() for col in slope_data.columns]  # Clean column names
+    return slope_data
+
+# ------------------------------
+# Build Edge Index
+# ------------------------------
+def build_edge_index(slope_data):
+    """
+    Builds the SlopeEdges index for a slope DataFrame, either the full dataset
+    or a threshold-based file.
+    Returns None if the DataFrame is empty.
+    """
+    if slope_data.empty:
+        return None
+
+    # Assign unique IDs to nodes based on their coordinates: stack start and end
+    # points and factorize them in one pass, so the first half of the codes are
+    # the edge sources and the second half the edge targets
+    num_edges = len(slope_data)
+    coords = np.concatenate([
+        slope_data[['start_lat', 'start_lon']].to_numpy(),
+        slope_data[['end_lat', 'end_lon']].to_numpy()
+    ])
+    # Quantize each (lat, lon) to integer NODE_COORD_SCALE units and pack the
+    # pair into one int64, so factorize hashes a single flat integer array and
+    # points that differ only by float noise share a node
+    quantized = np.round(coords * NODE_COORD_SCALE).astype(np.int64)
+    keys = (quantized[:, 0] << 32) | (quantized[:, 1] & 0xFFFFFFFF)
+    codes, uniques = pd.factorize(keys)
+    codes = codes.astype(np.int32)
+
+    # The first occurrence of each node keeps its original coordinates.
+    # factorize numbers nodes 0..N-1, so these come out in node id order
+    first_seen = np.unique(codes, return_index=True)[1]
+
+    # Contiguous (lon, lat) coordinate array indexed by node id for nearest-node
+    # search and the A* heuristic. It stays float64: float32 rounding shifts
+    # nodes by up to half a metre, enough for the heuristic to overestimate
+    # short edges and return slightly suboptimal routes
+    node_xy = np.ascontiguousarray(coords[first_seen][:, ::-1], dtype=np.float64)
+
+    if 'abs_slope_percentage' in slope_data.columns:
+        slopes = slope_data['abs_slope_percentage'].to_numpy(dtype=np.float64)
+    else:
+        slopes = np.zeros(num_edges)
+    if 'geometry' in slope_data.columns:
+        geometries = slope_data['geometry'].to_numpy(dtype=object)
+    else:
+        geometries = np.full(num_edges, None, dtype=object)
+
+    # Stable sort so edges with equal slopes keep their file order
+    order = np.argsort(slopes, kind='stable')
+    return SlopeEdges(
+        node_xy,
+        codes[:num_edges][order],
+        codes[num_edges:][order],
+        slope_data['length'].to_numpy(dtype=np.float64)[order],
+        slopes[order],
+        geometries[order]
+    )
+
+def edge_index_to_arrays(edges):
+    """
+    Flattens a SlopeEdges index into plain NumPy arrays for np.savez. Edge
+    geometries (LineStrings) are stored as their flattened vertex coordinates
+    plus the edge each vertex belongs to, so no pickled objects are needed.
+    """
+    geom_coords, geom_index = shapely.get_coordinates(
+        parse_geometries(edges.geometries), return_index=True
+    )
+    return {
+        'node_xy': edges.node_xy,
+        'u_ids': edges.u_ids,
+        'v_ids': edges.v_ids,
+        'lengths': edges.lengths,
+        'slopes': edges.slopes,
+        'geom_coords': geom_coords,
+        'geom_index': geom_index.astype(np.int32)
+    }
+
+def edge_index_from_arrays(arrays):
+    """
+    Rebuilds a SlopeEdges index from the arrays of edge_index_to_arrays. Edge
+    geometries are rebuilt as LineStrings in one vectorized call; edges
+    without geometry stay None.
+    """
+    geometries = np.empty(len(arrays['lengths']), dtype=object)
+    if len(arrays['geom_index']):
+        shapely.linestrings(arrays['geom_coords'], indices=arrays['geom_index'], out=geometries)
+    return SlopeEdges(
+        arrays['node_xy'],
+        arrays['u_ids'],
+        arrays['v_ids'],
+        arrays['lengths'],
+        arrays['slopes'],
+        geometries
+    )
+
+# ------------------------------
+# Build Threshold Graph
+# ------------------------------
+def build_threshold_graph(edges, threshold=None):
+    """
+    Builds the street graph of the edges with abs_slope_percentage <= threshold
+    (all edges if threshold is None) from a SlopeEdges index.
+    Returns a SlopeGraph, where node_xy is the index's [N, 2] float64 array of
+    (lon, lat) coordinates, tree is a spatial index over node_ids for
+    find_nearest_nodes and csr is the length-weighted adjacency matrix used for
+    routing, or None if no street meets the threshold.
+    """
+    num_edges = len(edges.slopes)
+    if threshold is not None:
+        num_edges = int(np.searchsorted(edges.slopes, threshold, side='right'))
+    if num_edges == 0:
+        return None
+    u_ids, v_ids = edges.u_ids[:num_edges], edges.v_ids[:num_edges]
+
+    # Collapse parallel edges up front: only the shortest edge between a pair of
+    # nodes can be on a shortest path, and csr_matrix would otherwise sum
+    # duplicate (u, v) entries
+    shortest = (
+        pd.DataFrame({'u': u_ids, 'v': v_ids, 'length': edges.lengths[:num_edges]})
+        .groupby(['u', 'v'], sort=False)['length']
+        .idxmin()
+        .to_numpy()
+    )
+    # Sorted by (u, v), the remaining edges are already in CSR order
+    shortest = shortest[np.lexsort((v_ids[shortest], u_ids[shortest]))]
+    u_ids, v_ids = u_ids[shortest], v_ids[shortest]
+
+    # Only nodes touched by a remaining edge are snapping targets
+    node_ids = np.unique(np.concatenate([u_ids, v_ids])).astype(np.int32)
+    tree = cKDTree(lonlat_to_unit_xyz(edges.node_xy[node_ids]))
+
+    # Edge weights stay float64: csgraph.dijkstra converts any other dtype to
+    # float64 on every call, which would cost an O(E) copy per query
+    num_nodes = len(edges.node_xy)
+    indptr = np.zeros(num_nodes + 1, dtype=np.int32)
+    np.cumsum(np.bincount(u_ids, minlength=num_nodes), out=indptr[1:])
+    csr = csr_matrix(
+        (edges.lengths[shortest], v_ids, indptr),
+        shape=(num_nodes, num_nodes)
+    )
+
+    # Positions into the shared geometries instead of per-graph copies
+    edge_pos = shortest.astype(np.int32)
+
+    return SlopeGraph(edges.node_xy, node_ids, tree, csr, edge_pos, edges.geometries)
+
+# ------------------------------
+# Load Edge Index / Threshold Graph (cached)
+# ------------------------------
+def load_remote_edge_index(slope_url):
+    """
+    Builds the SlopeEdges index of a downloaded slope file, keeping a copy on
+    disk in SLOPE_CACHE_DIR. The download carries the ETag the copy was built
+    from, so on a 304 the saved arrays are loaded instead of parsing it again.
+    The saved copy is also used if GitHub cannot be reached.
+    """
+    cache_base = os.path.join(SLOPE_CACHE_DIR, hashlib.sha1(slope_url.encode()).hexdigest())
+    cache_path, etag_path = cache_base + ".npz", cache_base + ".etag"
+
+    headers = {}
+    if os.path.exists(cache_path) and os.path.exists(etag_path):
+        with open(etag_path) as f:
+            headers['If-None-Match'] = f.read()
+
+    try:
+        response = get_http_session().get(slope_url, headers=headers, timeout=HTTP_TIMEOUT)
+        if response.status_code != 304:
+            response.raise_for_status()
+    except requests.RequestException:
+        if 'If-None-Match' not in headers:
+            raise
+        response = None
+
+    if response is None or response.status_code == 304:
+        with np.load(cache_path) as arrays:
+            return edge_index_from_arrays(arrays)
+
+    edges = build_edge_index(load_slope_data(slope_url, response.content))
+    if edges is not None and 'ETag' in response.headers:
+        # Write to temporary names and rename, so a concurrent or interrupted
+        # write never leaves a half-written copy behind
+        try:
+            os.makedirs(SLOPE_CACHE_DIR, exist_ok=True)
+            np.savez(cache_base + ".tmp.npz", **edge_index_to_arrays(edges))
+            os.replace(cache_base + ".tmp.npz", cache_path)
+            with open(cache_base + ".tmp.etag", "w") as f:
+                f.write(response.headers['ETag'])
+            os.replace(cache_base + ".tmp.etag", etag_path)
+        except OSError:
+            pass  # The disk copy is only an optimization
+    return edges
+
+@st.cache_resource(show_spinner=False)
+def load_edge_index(slope_file):
+    """
+    Returns the SlopeEdges index for slope_file, read and built once per file
+    and then shared by all of its threshold graphs.
+    A .npz file is an index prebuilt by Pitts_Preload_Graph.py and only needs
+    its arrays loaded; any other slope file is parsed and factorized, and
+    downloaded ones are also cached on disk by load_remote_edge_index.
+    """
+    if slope_file.endswith(".npz"):
+        with np.load(io.BytesIO(read_binary(slope_file))) as arrays:
+            return edge_index_from_arrays(arrays) if len(arrays['lengths']) else None
+
+    if slope_file.startswith(("http://", "https://")):
+        return load_remote_edge_index(slope_file)
+    return build_edge_index(load_slope_data(slope_file))
+
+@st.cache_resource(show_spinner=False)
+def load_graph(slope_file, threshold=None):
+    """
+    Returns the SlopeGraph of the streets in slope_file within threshold, built
+    once per (file, threshold) and then shared. Thresholds are whole percents,
+    so each network caches at most one graph per selectable threshold, all
+    derived from the single load_edge_index entry of the file.
+    Returns None if no street meets the threshold.
+    """
+    edges = load_edge_index(slope_file)
+    return build_threshold_graph(edges, threshold) if edges is not None else None
+
+# ------------------------------
+# Shortest Path Solver
+# ------------------------------
+def haversine_meters(lat1, lon1, lat2, lon2):
+    """
+    Great-circle distance in meters between two (lat, lon) points in degrees.
+    """
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * 6371008.8 * np.arcsin(np.sqrt(a))
+
+def astar_csr(indptr, indices, weights, node_lon, node_lat, source, target, limit):
+    """
+    Point-to-point A* search over CSR arrays, using the great-circle distance
+    to target as the heuristic. Street lengths are measured along the street,
+    so the heuristic never overestimates and the first time target is settled
+    its distance is the shortest one. The search also stops once no remaining
+    node can reach target within limit.
+    The priority queue is a binary heap held in two preallocated arrays; stale
+    entries are skipped via the settled flags instead of a decrease-key, so at
+    most one push per edge relaxation (E + 1 in total).
+    Returns (distance to target, predecessor array); the distance is inf if
+    target is unreachable within limit.
+    """
+    num_nodes = indptr.shape[0] - 1
+    dist = np.full(num_nodes, np.inf)
+    pred = np.full(num_nodes, -1, dtype=np.int64)
+    settled = np.zeros(num_nodes, dtype=np.bool_)
+    heap_key = np.empty(indices.shape[0] + 1, dtype=np.float64)
+    heap_node = np.empty(indices.shape[0] + 1, dtype=np.int64)
+
+    # Haversine terms that only depend on the target
+    target_lat = np.radians(np.float64(node_lat[target]))
+    target_lon = np.radians(np.float64(node_lon[target]))
+    cos_target_lat = np.cos(target_lat)
+
+    dist[source] = 0.0
+    heap_key[0] = 0.0
+    heap_node[0] = source
+    heap_size = 1
+
+    while heap_size > 0:
+        # Pop the root, then sift the last entry down from the top
+        fu = heap_key[0]
+        u = heap_node[0]
+        heap_size -= 1
+        if heap_size > 0:
+            key = heap_key[heap_size]
+            node = heap_node[heap_size]
+            i = 0
+            while True:
+                child = 2 * i + 1
+                if child >= heap_size:
+                    break
+                if child + 1 < heap_size and heap_key[child + 1] < heap_key[child]:
+                    child += 1
+                if heap_key[child] >= key:
+                    break
+                heap_key[i] = heap_key[child]
+                heap_node[i] = heap_node[child]
+                i = child
+            heap_key[i] = key
+            heap_node[i] = node
+
+        if settled[u]:
+            continue
+        settled[u] = True
+        if u == target or fu > limit:
+            break
+
+        du = dist[u]
+        for k in range(indptr[u], indptr[u + 1]):
+            v = indices[k]
+            dv = du + weights[k]
+            if dv < dist[v]:
+                # Inlined haversine lower bound from v to target
+                lat = np.radians(np.float64(node_lat[v]))
+                lon = np.radians(np.float64(node_lon[v]))
+                hav = (
+                    np.sin((target_lat - lat) / 2) ** 2
+                    + np.cos(lat) * cos_target_lat * np.sin((target_lon - lon) / 2) ** 2
+                )
+                fv = dv + 2 * 6371008.8 * np.arcsin(np.sqrt(hav))
+                if fv > limit:
+                    continue
+                dist[v] = dv
+                pred[v] = u
+                # Push (fv, v) and sift it up
+                i = heap_size
+                heap_size += 1
+                while i > 0:
+                    parent = (i - 1) // 2
+                    if heap_key[parent] <= fv:
+                        break
+                    heap_key[i] = heap_key[parent]
+                    heap_node[i] = heap_node[parent]
+                    i = parent
+                heap_key[i] = fv
+                heap_node[i] = v
+
+    return dist[target], pred
+
+if njit is not None:
+    astar_csr = njit(cache=True)(astar_csr)
+    # Pay the JIT (or on-disk cache load) cost at import, not on the first query.
+    # The coordinates are column views like graph.node_xy[:, 0] so the warm-up
+    # compiles the same array layout that real queries use
+    warmup_xy = np.zeros((2, 2))
+    astar_csr(
+        np.array([0, 1, 1], dtype=np.int32),
+        np.array([1], dtype=np.int32),
+        np.array([1.0]),
+        warmup_xy[:, 0],
+        warmup_xy[:, 1],
+        0,
+        1,
+        np.inf
+    )
+
+def compute_shortest_path(graph, start_node, end_node):
+    """
+    Computes the shortest path by street length between two graph nodes over
+    the cached CSR adjacency, using the Numba-compiled astar_csr when numba is
+    installed and scipy's compiled Dijkstra otherwise.
+    Returns (path_length, path).
+    The search is first bounded to ROUTE_LIMIT_FACTOR times the great-circle
+    distance between the two nodes, which covers realistic street detours
+    without expanding the whole city, and repeated unbounded if that fails.
+    Raises nx.NetworkXNoPath if end_node is unreachable, so callers do not need
+    a separate nx.has_path traversal.
+    """
+    def search(limit):
+        if njit is not None:
+            csr = graph.csr
+            return astar_csr(
+                csr.indptr, csr.indices, csr.data, graph.node_xy[:, 0], graph.node_xy[:, 1],
+                start_node, end_node, limit
+            )
+        dist, pred = dijkstra(
+            graph.csr, directed=True, indices=start_node, return_predecessors=True, limit=limit
+        )
+        return dist[end_node], pred
+
+    (start_lon, start_lat), (end_lon, end_lat) = graph.node_xy[[start_node, end_node]]
+    limit = ROUTE_LIMIT_FACTOR * float(haversine_meters(start_lat, start_lon, end_lat, end_lon))
+    path_length, pred = search(limit)
+    if np.isinf(path_length):
+        path_length, pred = search(np.inf)
+    if np.isinf(path_length):
+        raise nx.NetworkXNoPath(f"No path between {start_node} and {end_node}.")
+
+    # Walk the predecessor array back from the target
+    path = [int(end_node)]
+    while path[-1] != start_node:
+        path.append(int(pred[path[-1]]))
+    path.reverse()
+
+    return float(path_length), path
+
+@st.cache_data(max_entries=512, show_spinner=False)
+def solve_shortest_path(slope_file, threshold, start_node, end_node):
+    """
+    Memoized compute_shortest_path for already-snapped node ids. Results are
+    keyed on (slope_file, threshold, start_node, end_node) so repeating a
+    query, or switching back to a threshold tried earlier, skips the graph
+    search.
+    Returns (path_length, path) or None if end_node is unreachable.
+    """
+    graph = load_graph(slope_file, threshold)
+    try:
+        path_length, path = compute_shortest_path(graph, start_node, end_node)
+    except nx.NetworkXNoPath:
+        return None
+    return path_length, tuple(path)
+
+# ------------------------------
+# Route Geometry (cached)
+# ------------------------------
+@st.cache_data(max_entries=64, show_spinner=False)
+def get_path_coords(slope_file, threshold, start_node, end_node):
+    """
+    Returns the shortest path between two snapped nodes as one continuous list
+    of (lat, lon) points, using detailed edge geometry where available.
+    """
+    graph = load_graph(slope_file, threshold)
+    _, shortest_path = solve_shortest_path(slope_file, threshold, start_node, end_node)
+
+    if len(shortest_path) < 2:
+        return []
+
+    # edge_pos points at the geometry of the shortest parallel edge, still
+    # encoded as read, so only the path's edges are ever parsed. Each edge is
+    # found by binary search among its start node's sorted csr.indices. Edges
+    # without a geometry are drawn as a straight segment between their nodes
+    indptr, indices = graph.csr.indptr, graph.csr.indices
+    edges = list(zip(shortest_path, shortest_path[1:]))
+    slots = [indptr[u] + np.searchsorted(indices[indptr[u]:indptr[u + 1]], v) for u, v in edges]
+    geometries = parse_geometries(graph.geometries[graph.edge_pos[slots]])
+    for i, (u, v) in enumerate(edges):
+        if geometries[i] is None:
+            geometries[i] = shapely.linestrings(graph.node_xy[[u, v]])
+
+    # Pull every vertex out of GEOS in one call. Edge geometries run from u to
+    # v, so each edge starts where the previous one ended: drop that repeated
+    # first vertex to chain the edges into one coordinate list
+    coords, edge_index = shapely.get_coordinates(geometries, return_index=True)
+    starts_edge = np.r_[False, edge_index[1:] != edge_index[:-1]]
+    repeated = starts_edge & np.r_[False, (coords[1:] == coords[:-1]).all(axis=1)]
+
+    # Convert (lon, lat) to (lat, lon)
+    return coords[~repeated][:, ::-1].tolist()
+
+# ------------------------------
+# Render Shortest Path Map
+# ------------------------------
+def build_path_deck(path_coords, start_point, end_point):
+    """
+    Draws the shortest path as a single WebGL PathLayer with start and end
+    markers and returns the pydeck Deck for st.pydeck_chart.
+    """
+    midpoint = [(start_point[0] + end_point[0]) / 2, (start_point[1] + end_point[1]) / 2]
+
+    path_layer = pdk.Layer(
+        "PathLayer",
+        data=[{'path': [[lon, lat] for lat, lon in path_coords], 'color': [0, 0, 255, 180]}],
+        get_path='path',
+        get_color='color',
+        width_scale=1,
+        width_min_pixels=4
+    )
+    marker_layer = pdk.Layer(
+        "ScatterplotLayer",
+        data=[
+            {'position': [start_point[1], start_point[0]], 'color': [0, 160, 0], 'label': "Start"},
+            {'position': [end_point[1], end_point[0]], 'color': [220, 0, 0], 'label': "End"}
+        ],
+        get_position='position',
+        get_fill_color='color',
+        radius_min_pixels=7,
+        pickable=True
+    )
+
+    return pdk.Deck(
+        layers=[path_layer, marker_layer],
+        initial_view_state=pdk.ViewState(latitude=midpoint[0], longitude=midpoint[1], zoom=13),
+        map_provider="carto",
+        map_style="light",
+        tooltip={'text': "{label}"}
+    )
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def render_path_map_html(path_coords, start_point, end_point):
+    """
+    Folium fallback for build_path_deck (MAP_RENDERER = "folium"): draws the
+    path as a single PolyLine and returns the standalone map HTML. Cached per
+    route, so reruns that do not change the route reuse the same HTML.
+    """
+    midpoint = [(start_point[0] + end_point[0]) / 2, (start_point[1] + end_point[1]) / 2]
+    m = folium.Map(location=midpoint, zoom_start=13, tiles="CartoDB positron")
+
+    # Both endpoints can snap to the same node, leaving no line to draw
+    if len(path_coords) >= 2:
+        folium.PolyLine(path_coords, color="blue", weight=5, opacity=0.7).add_to(m)
+
+    # Add markers for start and end points
+    folium.Marker(location=start_point, icon=folium.Icon(color="green"), popup="Start").add_to(m)
+    folium.Marker(location=end_point, icon=folium.Icon(color="red"), popup="End").add_to(m)
+
+    return m.get_root().render()
+
 # ------------------------------
 # Visualize Shortest Path with Slope Constraint
 # ------------------------------
@@ -49,124 +905,52 @@ def visualize_shortest_path_with_slope(
     network_label="Network"
 ):
     """
-    Loads the specified threshold-based slope CSV, filters edges by threshold,
-    and then computes the shortest path from start_location to end_location.
-    Returns a Folium map if successful, or None if an error occurs.
+    Geocodes the two locations in the background while fetching the cached
+    graph of the streets in slope_file within threshold, snaps them to the
+    nearest graph nodes and computes the shortest path between them.
+    Returns a pydeck Deck (or Folium map HTML when MAP_RENDERER is "folium")
+    if successful, or None if an error occurs.
     """
     try:
+        # Start both lookups before loading the graph, so they overlap each
+        # other and the graph build. The pool is shut down without waiting;
+        # its threads exit once both lookups finish
+        geocode_pool = ThreadPoolExecutor(max_workers=2)
+        start_future = geocode_pool.submit(geocode_cached, normalize_address(start_location))
+        end_future = geocode_pool.submit(geocode_cached, normalize_address(end_location))
+        geocode_pool.shutdown(wait=False)
+
         st.write(f"Loading {network_label} street network graph from slope CSV:")
         st.write(f"  -> {slope_file}")
 
-        slope_data = pd.read_csv(slope_file, skip_blank_lines=True, header=0)
-        slope_data.columns = [col.strip() for col in slope_data.columns]  # Clean column names
-
-        # If geometry column exists, convert from WKT to shapely geometry
-        if 'geometry' in slope_data.columns:
-            slope_data['geometry'] = slope_data['geometry'].apply(wkt.loads)
-
-        # Filter the slope data by threshold
-        filtered_slope_data = slope_data[slope_data['abs_slope_percentage'] <= threshold]
-        if filtered_slope_data.empty:
+        threshold = int(threshold)
+        graph = load_graph(slope_file, threshold)
+        if graph is None:
             st.error("Filtered data is empty! No streets meet the slope threshold.")
             return None
 
-        # Assign unique IDs to nodes based on their coordinates
-        node_map = {}
-        node_id_counter = 0
-
-        def get_unique_node_id(lat, lon):
-            nonlocal node_id_counter
-            key = (lat, lon)
-            if key not in node_map:
-                node_map[key] = node_id_counter
-                node_id_counter += 1
-            return node_map[key]
-
-        # Initialize graph
-        G = nx.MultiDiGraph()
-
-        # Add edges to the graph and include geometry if available
-        for _, row in filtered_slope_data.iterrows():
-            u_id = get_unique_node_id(row['start_lat'], row['start_lon'])
-            v_id = get_unique_node_id(row['end_lat'], row['end_lon'])
-
-            # Add nodes if they are not already present
-            if u_id not in G.nodes:
-                G.add_node(u_id, y=row['start_lat'], x=row['start_lon'])
-            if v_id not in G.nodes:
-                G.add_node(v_id, y=row['end_lat'], x=row['end_lon'])
-
-            edge_attrs = {
-                'length': row['length'],
-                'slope': row['abs_slope_percentage']
-            }
-            if 'geometry' in row and pd.notnull(row['geometry']):
-                edge_attrs['geometry'] = row['geometry']
-
-            G.add_edge(u_id, v_id, **edge_attrs)
-
         st.write(f"{network_label} graph loaded and filtered by slope threshold {threshold}%.")
 
-        # Improve geocoding by appending Pittsburgh if missing
-        if "Pittsburgh" not in start_location:
-            start_location = f"{start_location}, Pittsburgh, PA"
-        if "Pittsburgh" not in end_location:
-            end_location = f"{end_location}, Pittsburgh, PA"
-
-        start_point = ox.geocode(start_location)
-        end_point = ox.geocode(end_location)
-
-        # Find the nearest nodes in the graph based on Euclidean distance
-        def find_nearest_node(graph, target_point):
-            target_geom = Point(target_point[1], target_point[0])
-            distances = {
-                node: target_geom.distance(Point(data['x'], data['y']))
-                for node, data in graph.nodes(data=True)
-            }
-            return min(distances, key=distances.get)
-
-        start_node = find_nearest_node(G, start_point)
-        end_node = find_nearest_node(G, end_point)
-
-        st.write("Calculating the shortest path using bidirectional Dijkstra's algorithm...")
-        if not nx.has_path(G, source=start_node, target=end_node):
+        start_point = start_future.result()
+        end_point = end_future.result()
+
+        # Find the nearest nodes in the graph using the cached spatial index
+        start_node, end_node = find_nearest_nodes(graph, [start_point, end_point])
+
+        st.write("Calculating the shortest path...")
+        solution = solve_shortest_path(slope_file, threshold, int(start_node), int(end_node))
+        if solution is None:
             st.error("No valid path exists between the start and end locations with the given slope threshold.")
             return None
-
-        # Calculate shortest path using bidirectional Dijkstra's algorithm (returns total length and path)
-        path_length, shortest_path = nx.bidirectional_dijkstra(G, source=start_node, target=end_node, weight='length')
+        path_length, _ = solution
         
         # Display the total path length
         st.write(f"Total path length: {path_length:.2f} meters")
 
-        # Plot the path on a Folium map using full edge geometries
-        midpoint = [(start_point[0] + end_point[0]) / 2, (start_point[1] + end_point[1]) / 2]
-        m = folium.Map(location=midpoint, zoom_start=13, tiles="CartoDB positron")
-
-        # For each consecutive node pair, use detailed geometry if available
-        for i in range(len(shortest_path) - 1):
-            u = shortest_path[i]
-            v = shortest_path[i + 1]
-            edge_data = G.get_edge_data(u, v)
-            # If multiple edges exist, choose the one with the smallest length
-            selected_edge = min(edge_data.values(), key=lambda x: x.get('length', float('inf')))
-
-            if 'geometry' in selected_edge and selected_edge['geometry'] is not None:
-                # Convert (lon, lat) to (lat, lon) for Folium
-                coords = [(pt[1], pt[0]) for pt in selected_edge['geometry'].coords]
-            else:
-                coords = [
-                    (G.nodes[u]['y'], G.nodes[u]['x']),
-                    (G.nodes[v]['y'], G.nodes[v]['x'])
-                ]
-
-            folium.PolyLine(coords, color="blue", weight=5, opacity=0.7).add_to(m)
-
-        # Add markers for start and end points
-        folium.Marker(location=start_point, icon=folium.Icon(color="green"), popup="Start").add_to(m)
-        folium.Marker(location=end_point, icon=folium.Icon(color="red"), popup="End").add_to(m)
-
-        return m
+        path_coords = get_path_coords(slope_file, threshold, int(start_node), int(end_node))
+        if MAP_RENDERER == "folium":
+            return render_path_map_html(path_coords, tuple(start_point), tuple(end_point))
+        return build_path_deck(path_coords, start_point, end_point)
 
     except Exception as e:
         st.error(f"An error occurred: {e}")
@@ -197,14 +981,12 @@ def main():
     # Set file paths & naming logic based on network type
     if network_type == "Vehicle Drive Network":
         preloaded_map_folder = "https://raw.githubusercontent.com/BOYKEFENG/Pittsburgh_Street_Map/refs/heads/main/preloaded_maps"
-        slope_threshold_folder = "https://raw.githubusercontent.com/BOYKEFENG/Pittsburgh_Street_Map/refs/heads/main/slope_thresholds"
-        slope_csv_prefix = "pittsburgh_street_slopes_threshold_"
+        full_slope_file = "https://raw.githubusercontent.com/BOYKEFENG/Pittsburgh_Street_Map/refs/heads/main/pittsburgh_street_slopes"
         network_label = "Vehicle Drive Network"
         max_threshold_value = 40
     else:
         preloaded_map_folder = "https://raw.githubusercontent.com/BOYKEFENG/Pittsburgh_Street_Map/refs/heads/main/bike_preloaded_maps"
-        slope_threshold_folder = "https://raw.githubusercontent.com/BOYKEFENG/Pittsburgh_Street_Map/refs/heads/main/bike_slope_thresholds"
-        slope_csv_prefix = "pittsburgh_bike_slopes_threshold_"
+        full_slope_file = "https://raw.githubusercontent.com/BOYKEFENG/Pittsburgh_Street_Map/refs/heads/main/pittsburgh_bike_slopes"
         network_label = "Bike Network"
         max_threshold_value = 43
 
@@ -229,7 +1011,8 @@ def main():
             display_preloaded_map(
                 threshold=slope_threshold,
                 map_folder=preloaded_map_folder,
-                network_label=network_label
+                network_label=network_label,
+                max_threshold=max_threshold_value
             )
 
     # 3B. Slope-Constrained Shortest Path Visualization
@@ -258,8 +1041,8 @@ def main():
             step=1
         )
 
-        # Construct the threshold-based CSV URL
-        slope_file = f"{slope_threshold_folder}/{slope_csv_prefix}{slope_threshold}.csv"
+        # The full network is loaded once and filtered by load_graph
+        slope_file = f"{full_slope_file}.{SLOPE_FILE_FORMAT}"
 
         # Button to compute and display the slope-constrained shortest path
         if st.button("Show Slope-Constrained Shortest Path"):
@@ -272,7 +1055,7 @@ def main():
                         slope_file=slope_file,
                         network_label=network_label
                     )
-                    if shortest_path_map:
+                    if shortest_path_map is not None:
                         st.session_state['shortest_path_with_slope'] = shortest_path_map
                         st.success("Path successfully generated.")
                     else:
@@ -280,7 +1063,11 @@ def main():
 
         # Display the map if it exists in the session state
         if 'shortest_path_with_slope' in st.session_state:
-            st_folium(st.session_state['shortest_path_with_slope'], width=700, height=500)
+            shortest_path_map = st.session_state['shortest_path_with_slope']
+            if isinstance(shortest_path_map, str):
+                st.components.v1.html(shortest_path_map, width=700, height=500)
+            else:
+                st.pydeck_chart(shortest_path_map, height=500)
 
 if __name__ == "__main__":
     main()
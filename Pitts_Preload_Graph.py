@@ -0,0 +1,37 @@
+import os
+
+import numpy as np
+
+from Pitts_Map import FULL_SLOPE_FILES, build_edge_index, edge_index_to_arrays, load_slope_data
+
+# ------------------------------
+# Prebuild One Edge Index
+# ------------------------------
+def save_edge_index(csv_path):
+    """
+    Builds the SlopeEdges index of a full-network slope CSV and saves its
+    arrays as .npz next to the CSV, so the Streamlit app can load the index
+    without parsing the CSV or factorizing node coordinates (see
+    edge_index_to_arrays for the layout).
+    Returns the .npz file path.
+    """
+    edges = build_edge_index(load_slope_data(csv_path))
+
+    npz_path = os.path.splitext(csv_path)[0] + ".npz"
+    np.savez(npz_path, **edge_index_to_arrays(edges))
+    return npz_path
+
+# ------------------------------
+# Prebuild All Edge Indexes
+# ------------------------------
+def main():
+    for csv_path in FULL_SLOPE_FILES:
+        if not os.path.exists(csv_path):
+            print(f"{csv_path} not found, skipping.")
+            continue
+        npz_path = save_edge_index(csv_path)
+        npz_size = os.path.getsize(npz_path) / 1e6
+        print(f"{csv_path} -> {npz_path} ({npz_size:.1f} MB)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+import os
+
+import pandas as pd
+import shapely
+
+from Pitts_Map import FULL_SLOPE_FILES, parse_geometries
+
+# ------------------------------
+# Convert One Slope CSV
+# ------------------------------
+def convert_csv_to_parquet(csv_path):
+    """
+    Converts a slope CSV to Parquet next to it, storing the
+    geometry column as WKB bytes instead of WKT text so the Streamlit app can
+    decode it with shapely.from_wkb. Returns the Parquet file path.
+    """
+    slope_data = pd.read_csv(csv_path, skip_blank_lines=True, header=0, engine='pyarrow')
+    slope_data.columns = [col.strip() for col in slope_data.columns]  # Clean column names
+
+    if 'geometry' in slope_data.columns:
+        geometries = parse_geometries(slope_data['geometry'])
+        slope_data['geometry'] = shapely.to_wkb(geometries, hex=False)
+
+    parquet_path = os.path.splitext(csv_path)[0] + ".parquet"
+    slope_data.to_parquet(parquet_path, engine='pyarrow', index=False)
+    return parquet_path
+
+# ------------------------------
+# Convert All Slope CSVs
+# ------------------------------
+def report_conversion(csv_path, parquet_path):
+    """
+    Prints the size of a converted slope CSV next to its Parquet file.
+    """
+    csv_size = os.path.getsize(csv_path) / 1e6
+    parquet_size = os.path.getsize(parquet_path) / 1e6
+    print(f"{csv_path} ({csv_size:.1f} MB) -> {parquet_path} ({parquet_size:.1f} MB)")
+
+def main():
+    for csv_path in FULL_SLOPE_FILES:
+        if not os.path.exists(csv_path):
+            print(f"{csv_path} not found, skipping.")
+            continue
+        report_conversion(csv_path, convert_csv_to_parquet(csv_path))
+
+if __name__ == "__main__":
+    main()